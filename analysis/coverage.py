@@ -1,8 +1,19 @@
 import subprocess
-import json
+import functools
+import hashlib
+import os
+import re
+import shutil
+import tempfile
 from pathlib import Path
+from typing import Optional
 import sys
 
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
 from config.paths import (
     TARGET_REPOS_DIR,
     VENVS_DIR,
@@ -11,6 +22,8 @@ from config.paths import (
 
 VALIDATION_REPOS = {"attrs", "jinja2", "itsdangerous"}
 
+COVERAGE_CACHE_DIR = DATA_DIR / "cache"
+
 # ---------------------------------------------------------
 # Repo → package override (explicit, intentional)
 # ---------------------------------------------------------
@@ -21,6 +34,62 @@ REPO_PACKAGE_OVERRIDES = {
 }
 
 
+# ---------------------------------------------------------
+# Coverage config (generated per run, repo configs ignored)
+# ---------------------------------------------------------
+# parallel + patch=subprocess let pytest-xdist workers record their own
+# data files, which are merged with `coverage combine` afterwards.
+# patch = subprocess needs coverage >= 7.10; older versions only warn about
+# the unknown option and leave the workers unmeasured.
+MIN_COVERAGE_VERSION = (7, 10)
+
+COVERAGE_RC_TEMPLATE = """\
+[run]
+source = {package_name}
+parallel = True
+patch = subprocess
+data_file = {data_file}
+"""
+
+
+# Exits non-zero when the target venv's coverage predates patch=subprocess
+# (argv = minimum version as "major.minor").
+COVERAGE_VERSION_SCRIPT = """\
+import sys
+import coverage
+
+required = tuple(int(p) for p in sys.argv[1].split("."))
+if coverage.version_info[:2] < required:
+    sys.exit(f"coverage {coverage.__version__} is older than {sys.argv[1]}")
+"""
+
+
+# Combine per-worker data and write the JSON report in ONE interpreter
+# (run inside the target venv: argv = rcfile, output path).
+COVERAGE_REPORT_SCRIPT = """\
+import sys
+import coverage
+
+cov = coverage.Coverage(config_file=sys.argv[1])
+cov.combine()
+cov.save()
+cov.json_report(outfile=sys.argv[2], pretty_print=True)
+"""
+
+
+# Coverage variables inherited from the caller's environment. They are
+# only set when the pipeline itself runs under coverage; left in place they
+# would hook the target's test processes into that outer session (its
+# config, its data file) instead of the run configured by our rcfile.
+# Subprocesses the target's tests spawn are still measured either way:
+# patch = subprocess sets COVERAGE_PROCESS_CONFIG for them itself.
+INHERITED_COVERAGE_ENV = (
+    "COVERAGE_PROCESS_START",
+    "COVERAGE_PROCESS_CONFIG",
+    "COVERAGE_FILE",
+)
+
+
 class CoverageError(Exception):
     pass
 
@@ -28,7 +97,8 @@ class CoverageError(Exception):
 # ---------------------------------------------------------
 # Package detection (flat + src layout)
 # ---------------------------------------------------------
-def detect_package_name(repo_path: Path) -> str:
+@functools.lru_cache(maxsize=None)
+def detect_package_name(repo_path_str: str) -> str:
     """
     Detect the primary Python package in a repository.
 
@@ -37,33 +107,39 @@ def detect_package_name(repo_path: Path) -> str:
     - Src layout:  repo/src/<pkg>/__init__.py
 
     Fails explicitly if the package cannot be uniquely determined.
+    Memoized per path (takes a str so it is hashable by lru_cache).
     """
+    repo_path = Path(repo_path_str)
+
+    # Explicit override takes precedence (no filesystem scan needed)
+    repo_name = repo_path.name
+    if repo_name in REPO_PACKAGE_OVERRIDES:
+        return REPO_PACKAGE_OVERRIDES[repo_name]
 
     candidates = []
 
-    # Flat layout
-    for p in repo_path.iterdir():
-        if (
-            p.is_dir()
-            and (p / "__init__.py").exists()
-            and p.name not in {"tests", "test"}
-        ):
-            candidates.append(p.name)
+    # Flat layout (scandir entries cache is_dir, saving a stat per entry)
+    with os.scandir(repo_path) as entries:
+        for entry in entries:
+            if (
+                entry.is_dir()
+                and entry.name not in {"tests", "test"}
+                and os.path.exists(os.path.join(entry.path, "__init__.py"))
+            ):
+                candidates.append(entry.name)
 
     # src/ layout
     src_dir = repo_path / "src"
-    if src_dir.exists():
-        for p in src_dir.iterdir():
-            if p.is_dir() and (p / "__init__.py").exists():
-                candidates.append(p.name)
+    if src_dir.is_dir():
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                if entry.is_dir() and os.path.exists(
+                    os.path.join(entry.path, "__init__.py")
+                ):
+                    candidates.append(entry.name)
 
     candidates = sorted(set(candidates))
 
-    # Explicit override takes precedence
-    repo_name = repo_path.name
-    if repo_name in REPO_PACKAGE_OVERRIDES:
-        return REPO_PACKAGE_OVERRIDES[repo_name]
-
     if len(candidates) != 1:
         raise CoverageError(
             f"Could not uniquely detect Python package in {repo_path}. "
@@ -76,23 +152,116 @@ def detect_package_name(repo_path: Path) -> str:
 # ---------------------------------------------------------
 # Pytest exclusions (global, conservative)
 # ---------------------------------------------------------
-def pytest_args() -> list[str]:
+# Top-level test classes asserting deprecation warnings (e.g. attrs'
+# TestAssoc). Nested classes are not matched: their node ids would need
+# the enclosing class, and a --deselect that matches nothing is silent.
+DESELECTED_CLASS_RE = re.compile(r"^class\s+(\w*TestAssoc\w*)", re.MULTILINE)
+
+# Covers pytest's default python_files patterns (test_*.py, *_test.py)
+TEST_FILE_GLOBS = ("test*.py", "*_test.py")
+
+
+def iter_test_files(repo_path: Path):
+    """Test modules under repo_path, sorted, matching TEST_FILE_GLOBS."""
+    return sorted({p for glob in TEST_FILE_GLOBS for p in repo_path.rglob(glob)})
+
+
+def pytest_args(repo_path: Path, workers="auto") -> list[str]:
     """
     Global pytest exclusions for environment-sensitive tests.
 
     - Excludes static type-checking tests (mypy / pyright)
     - Excludes deprecation-warning assertion tests
     - Does NOT affect runtime execution paths
+    - Distributes tests over `workers` pytest-xdist processes (default:
+      one per core)
+
+    mypy-named files are skipped at collection time (--ignore-glob) and
+    mypy-named tests in other files are deselected with -k. The classes
+    are deselected by node id, which --rootdir pins relative to repo_path.
+    """
+    args = [
+        "-p", "no:cacheprovider",
+        f"--rootdir={repo_path}",
+        "--ignore-glob=*mypy*",
+        "-k", "not mypy",
+    ]
+
+    for test_file in iter_test_files(repo_path):
+        try:
+            source = test_file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+
+        rel = test_file.relative_to(repo_path).as_posix()
+        for cls in DESELECTED_CLASS_RE.findall(source):
+            args.append(f"--deselect={rel}::{cls}")
+
+    return args + ["-n", str(workers)]
+
+
+# ---------------------------------------------------------
+# Subprocess environment
+# ---------------------------------------------------------
+def coverage_env() -> dict:
+    """
+    Environment for coverage subprocesses.
+
+    Strips coverage variables inherited from an outer coverage session
+    (see INHERITED_COVERAGE_ENV), so the target's run is measured only by
+    the generated rcfile. Set SUBPROCESS_COVERAGE=1 to pass them through
+    unchanged, e.g. to let that outer session follow into these
+    subprocesses. This does not change what the target run measures:
+    xdist workers and any other Python subprocesses of the tests are
+    traced via patch = subprocess in both cases.
     """
-    return ["-k", "not mypy and not TestAssoc"]
+    if os.environ.get("SUBPROCESS_COVERAGE") == "1":
+        return dict(os.environ)
+
+    return {
+        k: v for k, v in os.environ.items()
+        if k not in INHERITED_COVERAGE_ENV
+    }
+
+
+# ---------------------------------------------------------
+# Quiet subprocess runner
+# ---------------------------------------------------------
+# Tail of captured output attached to a CoverageError
+ERROR_OUTPUT_TAIL = 20_000
+
+
+def run_quiet(cmd: list[str], cwd: Path, env: dict, error: str) -> None:
+    """
+    Run a subprocess with stdout+stderr spooled to a temporary file.
+
+    Nothing is buffered in memory on success; on failure the tail of the
+    output is read back and attached to the raised CoverageError.
+    """
+    with tempfile.TemporaryFile() as log:
+        try:
+            subprocess.run(
+                cmd,
+                cwd=cwd,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                check=True,
+            )
+        except subprocess.CalledProcessError:
+            log.seek(0)
+            output = log.read().decode("utf-8", errors="replace")
+            raise CoverageError(f"{error}\n{output[-ERROR_OUTPUT_TAIL:]}")
 
 
 # ---------------------------------------------------------
 # Resolve repo-specific virtualenv python
 # ---------------------------------------------------------
+@functools.lru_cache(maxsize=None)
 def resolve_venv_python(repo_name: str) -> Path:
     """
     Resolve the Python executable for the repository-specific virtualenv.
+    Memoized per repo; failures are not cached.
     """
     venv_python = VENVS_DIR / repo_name / "bin" / "python"
 
@@ -104,107 +273,234 @@ def resolve_venv_python(repo_name: str) -> Path:
     return venv_python
 
 
+@functools.lru_cache(maxsize=None)
+def check_coverage_version(venv_python: Path) -> None:
+    """
+    Fail unless the venv's coverage supports `patch = subprocess` (see
+    MIN_COVERAGE_VERSION); without it xdist workers silently go unmeasured.
+    Memoized per interpreter; failures are not cached.
+    """
+    required = ".".join(map(str, MIN_COVERAGE_VERSION))
+    run_quiet(
+        [str(venv_python), "-c", COVERAGE_VERSION_SCRIPT, required],
+        cwd=venv_python.parent,
+        env=coverage_env(),
+        error=(
+            f"coverage>={required} is required in {venv_python} "
+            f"(re-run scripts/setup_workspace.py)"
+        ),
+    )
+
+
+# ---------------------------------------------------------
+# Coverage cache key (repo HEAD + test file mtimes)
+# ---------------------------------------------------------
+def coverage_cache_key(repo_path: Path) -> Optional[str]:
+    """
+    Key identifying a repository state for coverage reuse.
+
+    Combines the checked-out HEAD SHA with the mtimes of all test files.
+    Returns None when the repo is not a git checkout (never cached).
+    """
+    try:
+        head = subprocess.check_output(
+            ["git", "-C", str(repo_path), "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL,
+        )
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    test_mtimes = sorted(
+        (str(p.relative_to(repo_path)), p.stat().st_mtime_ns)
+        for p in iter_test_files(repo_path)
+    )
+
+    return hashlib.sha1(head + str(test_mtimes).encode()).hexdigest()
+
+
 # ---------------------------------------------------------
 # Coverage collection (ONE repo at a time)
 # ---------------------------------------------------------
-def collect_coverage(repo_path: Path) -> dict:
+def generate_coverage_report(
+    repo_path: Path, force: bool = False, workers="auto"
+) -> Path:
+    """
+    Run the repository's test suite under coverage and return the path of
+    the (pretty-printed) JSON report. workers is the xdist process count.
+
+    Results are cached under DATA_DIR/cache keyed by coverage_cache_key;
+    pass force=True to ignore the cache and re-run the suite.
+    """
     repo_path = repo_path.resolve()
 
     if not repo_path.exists():
         raise CoverageError(f"Repo path does not exist: {repo_path}")
 
     repo_name = repo_path.name
-    package_name = detect_package_name(repo_path)
-    venv_python = resolve_venv_python(repo_name)
 
-    # -----------------------------
-    # Step 1: Run coverage + pytest
-    # -----------------------------
-    cmd = [
-        str(venv_python),
-        "-m",
-        "coverage",
-        "run",
-        "--rcfile=/dev/null",        # ignore repo-specific configs
-        f"--source={package_name}",  # restrict to Python package only
-        "-m",
-        "pytest",
-    ]
-    cmd += pytest_args()
+    cache_key = coverage_cache_key(repo_path)
+    cache_file = None
+    if cache_key is not None:
+        cache_file = COVERAGE_CACHE_DIR / f"{repo_name}-{cache_key}.json"
+        if cache_file.exists() and not force:
+            print(f"[CACHE] Reusing coverage for {repo_name}: {cache_file}")
+            return cache_file
 
-    try:
-        subprocess.run(
+    package_name = detect_package_name(str(repo_path))
+    venv_python = resolve_venv_python(repo_name)
+    check_coverage_version(venv_python)
+    env = coverage_env()
+
+    with tempfile.TemporaryDirectory(prefix=f"{repo_name}-coverage-") as tmp:
+        rcfile = Path(tmp) / "coveragerc"
+        rcfile.write_text(
+            COVERAGE_RC_TEMPLATE.format(
+                package_name=package_name,
+                data_file=Path(tmp) / ".coverage",
+            )
+        )
+
+        # -----------------------------
+        # Step 1: Run coverage + pytest
+        # -----------------------------
+        cmd = [
+            str(venv_python),
+            "-m",
+            "coverage",
+            "run",
+            f"--rcfile={rcfile}",        # ignore repo-specific configs
+            "--parallel-mode",           # one data file per process
+            f"--source={package_name}",  # restrict to Python package only
+            "-m",
+            "pytest",
+        ]
+        cmd += pytest_args(repo_path, workers)
+
+        run_quiet(
             cmd,
             cwd=repo_path,
-            check=True,
-        )
-    except subprocess.CalledProcessError:
-        raise CoverageError(
-            f"Coverage execution failed for repository: {repo_name}"
+            env=env,
+            error=f"Coverage execution failed for repository: {repo_name}",
         )
 
-    # -----------------------------
-    # Step 2: Generate JSON report
-    # -----------------------------
-    try:
-        subprocess.run(
+        # -----------------------------
+        # Step 2: Combine + JSON report
+        # -----------------------------
+        run_quiet(
             [
                 str(venv_python),
-                "-m",
-                "coverage",
-                "json",
-                "-o",
+                "-c",
+                COVERAGE_REPORT_SCRIPT,
+                str(rcfile),
                 "coverage.json",
             ],
             cwd=repo_path,
-            check=True,
-        )
-    except subprocess.CalledProcessError:
-        raise CoverageError(
-            f"Coverage JSON generation failed for repository: {repo_name}"
+            env=env,
+            error=f"Coverage JSON generation failed for repository: {repo_name}",
         )
 
     coverage_file = repo_path / "coverage.json"
     if not coverage_file.exists():
         raise CoverageError("coverage.json not generated")
 
-    with open(coverage_file, "r") as f:
-        return json.load(f)
+    if cache_file is not None:
+        COVERAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(coverage_file, cache_file)
+
+    return coverage_file
+
+
+def collect_coverage(repo_path: Path, force: bool = False, workers="auto") -> dict:
+    """
+    Parsed JSON coverage report for a repository (see generate_coverage_report).
+    """
+    report = generate_coverage_report(repo_path, force=force, workers=workers)
+    return orjson.loads(report.read_bytes())
 
 
 # ---------------------------------------------------------
-# CLI entrypoint (explicit, one-shot)
+# Columnar export (file, line) for fast reloads
 # ---------------------------------------------------------
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python analysis/coverage.py <repo-name>")
-        print("Example: python analysis/coverage.py attrs")
-        sys.exit(1)
+def write_coverage_parquet(report: Path, output_file: Path) -> None:
+    """
+    Convert a coverage JSON report to a two-column Parquet table:
+    file (dictionary-encoded string) and line (int32), one row per
+    executed line. A measured file with no executed lines gets one row
+    with a null line, so every file in the JSON is kept.
+    """
+    files = orjson.loads(report.read_bytes()).get("files", {})
+
+    names = list(files)
+    executed = [files[name].get("executed_lines", []) for name in names]
+    counts = np.array([len(lines) for lines in executed], dtype=np.int64)
+    rows = np.maximum(counts, 1)
+
+    file_ids = np.repeat(np.arange(len(names), dtype=np.int32), rows)
+    lines = np.fromiter(
+        (line for file_lines in executed for line in (file_lines or (0,))),
+        dtype=np.int32,
+        count=int(rows.sum()),
+    )
 
-    repo_name = sys.argv[1]
+    table = pa.table({
+        "file": pa.DictionaryArray.from_arrays(
+            pa.array(file_ids), pa.array(names, type=pa.string())
+        ),
+        "line": pa.array(lines, mask=np.repeat(counts == 0, rows)),
+    })
+    pq.write_table(table, output_file)
 
+
+# ---------------------------------------------------------
+# Stage entrypoint (also called in-process by the pipeline)
+# ---------------------------------------------------------
+def run(repo_name: str, force: bool = False, workers="auto") -> None:
+    """
+    Coverage stage for one repo: refresh DATA_DIR/<repo>_coverage.json and
+    its Parquet sidecar. Non-validation repos are skipped. workers is the
+    pytest-xdist process count ("auto": one per core).
+
+    Raises CoverageError if the test run or report generation fails.
+    """
     if repo_name not in VALIDATION_REPOS:
         print(
             f"[SKIP] Coverage is only collected for validation repos.\n"
             f"Requested: {repo_name}\n"
             f"Allowed: {sorted(VALIDATION_REPOS)}"
         )
-        sys.exit(0)
+        return
 
     repo_path = TARGET_REPOS_DIR / repo_name
 
-
     DATA_DIR.mkdir(exist_ok=True)
 
-    try:
-        coverage_data = collect_coverage(repo_path)
+    report = generate_coverage_report(repo_path, force=force, workers=workers)
+
+    # Report is already pretty-printed; copy bytes, no re-serialization
+    output_file = DATA_DIR / f"{repo_name}_coverage.json"
+    shutil.copyfile(report, output_file)
+
+    parquet_file = output_file.with_suffix(".parquet")
+    write_coverage_parquet(report, parquet_file)
 
-        output_file = DATA_DIR / f"{repo_name}_coverage.json"
-        with open(output_file, "w") as f:
-            json.dump(coverage_data, f, indent=2)
+    print(f"[OK] Coverage saved to: {output_file} (+ {parquet_file.name})")
 
-        print(f"[OK] Coverage saved to: {output_file}")
 
+# ---------------------------------------------------------
+# CLI entrypoint (explicit, one-shot)
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    force = "--force" in args
+    args = [a for a in args if a != "--force"]
+
+    if len(args) != 1:
+        print("Usage: python analysis/coverage.py <repo-name> [--force]")
+        print("Example: python analysis/coverage.py attrs")
+        sys.exit(1)
+
+    try:
+        run(args[0], force=force)
     except CoverageError as e:
         print(f"[ERROR] {e}")
         sys.exit(2)
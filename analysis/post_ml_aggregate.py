@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
-import json
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow.parquet as pq
 from pathlib import Path
 
-from analysis.risk import classify_risk
-from recommendations.rules import recommend_tests
+from analysis.risk import (
+    COVERAGE_BUCKETS,
+    HIDDEN_RISK,
+    REFACTOR_CANDIDATE,
+    RISK_CATEGORIES,
+    coverage_bucket_codes,
+    risk_codes,
+)
+from recommendations.rules import REC_TABLE, recommendation_ids
 
 # ---------------------------------------------------------
 # Paths
@@ -15,68 +24,158 @@ PROCESSED_DIR = DATA_DIR / "processed"
 
 INPUT_CSV = PROCESSED_DIR / "ml_smell_predictions.csv"
 OUTPUT_FULL = PROCESSED_DIR / "final_results.csv"
+OUTPUT_FULL_PARQUET = OUTPUT_FULL.with_suffix(".parquet")
 OUTPUT_TOPK = PROCESSED_DIR / "final_results_topk.csv"
 
 TOP_K = 30
 
+# Prediction columns consumed here (both metric casings are accepted)
+INPUT_COLUMNS = {
+    "File_Path", "file_path",
+    "Method_Name", "method_name",
+    "start_line", "end_line",
+    "CC", "cc", "lloc", "difficulty",
+    "smell_label", "ml_confidence",
+}
+
+INPUT_DTYPES = {
+    "start_line": "int32",
+    "end_line": "int32",
+    "smell_label": "category",
+}
+
 # ---------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------
-def extract_repo_and_file(file_path: str):
-    p = Path(file_path).resolve()
-    parts = p.parts
-
-    if "target-repos" not in parts:
-        raise ValueError(f"Invalid File_Path format: {file_path}")
+def split_repo_paths(paths: pd.Series):
+    """
+    Split absolute .../target-repos/<repo>/<relative> paths into
+    (repo_name, relative_path) columns using vectorized string ops.
+    """
+    rest = paths.str.split("/target-repos/", n=1).str[1]
 
-    idx = parts.index("target-repos")
-    repo = parts[idx + 1]
-    relative = Path(*parts[idx + 2:])
+    invalid = rest.isna()
+    if invalid.any():
+        raise ValueError(f"Invalid File_Path format: {paths[invalid].iloc[0]}")
 
-    return repo, str(relative)
+    parts = rest.str.partition("/")
+    return parts[0], parts[2]
 
 
 def load_coverage(repo_name: str) -> dict:
+    """
+    Executed lines per covered file of a repo, keyed by '/'-separated path.
+
+    Lines are converted to sorted int arrays once here, at load time, so
+    row lookups are dict hits and no per-row set is ever built. The
+    Parquet export written by analysis/coverage.py is preferred over JSON.
+    """
+    parquet_file = DATA_DIR / f"{repo_name}_coverage.parquet"
+    if parquet_file.exists():
+        return load_coverage_parquet(parquet_file)
+
     coverage_file = DATA_DIR / f"{repo_name}_coverage.json"
     if not coverage_file.exists():
         return {}
 
-    with open(coverage_file) as f:
-        return json.load(f).get("files", {})
+    files = orjson.loads(coverage_file.read_bytes()).get("files", {})
+    return {
+        covered_file.replace("\\", "/"): np.unique(
+            np.asarray(data.get("executed_lines", []), dtype=np.int64)
+        )
+        for covered_file, data in files.items()
+    }
+
 
+def load_coverage_parquet(parquet_file: Path) -> dict:
+    """
+    Same mapping as load_coverage, from a (file, line) Parquet table.
+    Rows are grouped by file with one lexsort; no JSON is parsed. A null
+    line marks a file with no executed lines, which maps to an empty array
+    as it does from JSON.
+    """
+    table = pq.read_table(parquet_file).unify_dictionaries().combine_chunks()
+    if table.num_rows == 0:
+        return {}
 
-def compute_function_coverage(row, coverage_files) -> float:
-    file_path = row["file_path"]
-    start = int(row["start_line"])
-    end = int(row["end_line"])
+    files = table.column("file").chunk(0)
+    if not hasattr(files, "indices"):
+        files = files.dictionary_encode()
 
-    if start > end:
-        return 0.0
+    names = files.dictionary.to_pylist()
+    codes = files.indices.to_numpy()
+    line_column = table.column("line").chunk(0)
+    executed = line_column.is_valid().to_numpy(zero_copy_only=False)
+    lines = line_column.fill_null(0).to_numpy().astype(np.int64)
 
-    total_lines = end - start + 1
-    executed = set()
+    order = np.lexsort((lines, codes))
+    codes, lines, executed = codes[order], lines[order], executed[order]
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+
+    return {
+        names[codes[start]].replace("\\", "/"): np.unique(chunk[chunk_executed])
+        for start, chunk, chunk_executed in zip(
+            np.r_[0, bounds], np.split(lines, bounds), np.split(executed, bounds)
+        )
+    }
 
-    # ✅ KEEP THIS LOGIC — THIS IS WHY IT WORKS
-    for covered_file, data in coverage_files.items():
-        if covered_file.endswith(file_path):
-            executed_lines = set(data.get("executed_lines", []))
-            executed = executed_lines.intersection(range(start, end + 1))
-            break
 
-    if total_lines == 0:
-        return 0.0
+def _suffix_variants(covered_file: str):
+    """
+    covered_file followed by every shorter trailing run of its path
+    components: 'src/pkg/mod.py' -> 'src/pkg/mod.py', 'pkg/mod.py', 'mod.py'.
+    """
+    parts = covered_file.split("/")
+    for i in range(len(parts)):
+        yield "/".join(parts[i:])
 
-    return round((len(executed) / total_lines) * 100, 2)
 
+def index_suffixes(coverage: dict) -> dict:
+    """
+    Extend a load_coverage mapping so that every trailing path of a
+    covered file resolves with one dict lookup.
+
+    Exact paths win; among suffixes the first covered file in report
+    order keeps the key. Arrays are shared, not copied.
+    """
+    index = dict(coverage)
+    # ✅ KEEP THIS LOGIC — THIS IS WHY IT WORKS
+    for covered_file, lines in coverage.items():
+        for suffix in _suffix_variants(covered_file):
+            index.setdefault(suffix, lines)
+    return index
+
+
+def compute_function_coverage(df: pd.DataFrame, coverage_index: dict) -> np.ndarray:
+    """
+    Line coverage (%) of every function in df, computed per (repo, file).
+
+    coverage_index maps repo -> index_suffixes(load_coverage(repo)). The
+    number of executed lines inside [start_line, end_line] is two
+    searchsorted calls for all functions of a file at once.
+    """
+    starts = df["start_line"].to_numpy(dtype=np.int64)
+    ends = df["end_line"].to_numpy(dtype=np.int64)
+    covered = np.zeros(len(df), dtype=np.int64)
+
+    groups = df.groupby(["repo_name", "file_path"], sort=False).indices
+    for (repo, file_path), idx in groups.items():
+        lines = coverage_index.get(repo, {}).get(file_path)
+        if lines is None:
+            continue
+
+        covered[idx] = (
+            np.searchsorted(lines, ends[idx], side="right")
+            - np.searchsorted(lines, starts[idx], side="left")
+        )
+
+    total_lines = ends - starts + 1
+    percent = np.zeros(len(df), dtype=np.float64)
+    valid = total_lines > 0
+    percent[valid] = np.round(covered[valid] / total_lines[valid] * 100, 2)
+
+    return percent
 
-def coverage_bucket(p: float) -> str:
-    if p == 0:
-        return "ZERO"
-    if p <= 30:
-        return "LOW"
-    if p <= 70:
-        return "MEDIUM"
-    return "HIGH"
 
 # ---------------------------------------------------------
 # Main
@@ -85,7 +184,15 @@ def main():
     if not INPUT_CSV.exists():
         raise FileNotFoundError(INPUT_CSV)
 
-    df = pd.read_csv(INPUT_CSV)
+    header = pd.read_csv(INPUT_CSV, nrows=0).columns
+    usecols = [c for c in header if c in INPUT_COLUMNS]
+
+    df = pd.read_csv(
+        INPUT_CSV,
+        engine="pyarrow",
+        usecols=usecols,
+        dtype={c: t for c, t in INPUT_DTYPES.items() if c in usecols},
+    )
 
     # ---------------- Schema normalization ----------------
     if "CC" in df.columns and "cc" not in df.columns:
@@ -98,47 +205,35 @@ def main():
         df = df.rename(columns={"Method_Name": "method_name"})
 
     # ---------------- Repo + relative path ----------------
-    extracted = df["file_path"].apply(extract_repo_and_file)
-    df["repo_name"] = extracted.apply(lambda x: x[0])
-    df["file_path"] = extracted.apply(lambda x: x[1])
+    df["repo_name"], df["file_path"] = split_repo_paths(df["file_path"])
 
     # ---------------- Load coverage once per repo ----------------
-    coverage_cache = {
-        repo: load_coverage(repo)
+    coverage_index = {
+        repo: index_suffixes(load_coverage(repo))
         for repo in df["repo_name"].unique()
     }
 
     # ---------------- Function-level coverage ----------------
-    df["coverage_percent"] = df.apply(
-        lambda r: compute_function_coverage(
-            r, coverage_cache.get(r["repo_name"], {})
-        ),
-        axis=1,
-    )
-
-    df["coverage_bucket"] = df["coverage_percent"].apply(coverage_bucket)
-
-    # ---------------- Risk ----------------
-    df["risk_category"] = df.apply(
-        lambda r: classify_risk(r["smell_label"], r["coverage_bucket"]),
-        axis=1,
+    df["coverage_percent"] = compute_function_coverage(df, coverage_index)
+
+    # ---------------- Bucket -> risk -> recommendations ----------------
+    # Each step works on the integer codes of the previous one; strings
+    # are looked up once per column at the end.
+    bucket = coverage_bucket_codes(df["coverage_percent"].to_numpy())
+    risk = risk_codes(df["smell_label"], bucket)
+    rec_ids = recommendation_ids(
+        hidden_risk=risk == HIDDEN_RISK,
+        refactor_candidate=risk == REFACTOR_CANDIDATE,
+        zero_coverage=bucket == 0,
+        low_coverage=bucket <= 1,
+        cc=df.get("cc", 0),
+        lloc=df.get("lloc", 0),
+        difficulty=df.get("difficulty", 0),
     )
 
-    # ---------------- Recommendations ----------------
-    def build_recs(r):
-        return "; ".join(
-            recommend_tests(
-                {
-                    "risk_category": r["risk_category"],
-                    "coverage_bucket": r["coverage_bucket"],
-                    "cc": r.get("cc", 0),
-                    "lloc": r.get("lloc", 0),
-                    "difficulty": r.get("difficulty", 0),
-                }
-            )
-        )
-
-    df["recommendations"] = df.apply(build_recs, axis=1)
+    df["coverage_bucket"] = COVERAGE_BUCKETS[bucket]
+    df["risk_category"] = RISK_CATEGORIES[risk]
+    df["recommendations"] = REC_TABLE[rec_ids]
 
     # ---------------- Final schema ----------------
     final_cols = [
@@ -161,7 +256,8 @@ def main():
 
     PROCESSED_DIR.mkdir(exist_ok=True)
     df.to_csv(OUTPUT_FULL, index=False)
-    print(f"[OK] Full results written to {OUTPUT_FULL}")
+    df.to_parquet(OUTPUT_FULL_PARQUET, index=False)
+    print(f"[OK] Full results written to {OUTPUT_FULL} (+ {OUTPUT_FULL_PARQUET.name})")
 
     # ---------------- TOP-K Hidden Risk ----------------
     df_hr = df[df["smell_label"] == "HIGH"]
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def classify_risk(smell_label: str, coverage_bucket: str) -> str:
     """
     smell_label: 'HIGH' or 'LOW'
@@ -17,3 +20,55 @@ def classify_risk(smell_label: str, coverage_bucket: str) -> str:
         return "Low Value"
 
     return "Safe Zone"
+
+
+# ---------------------------------------------------------
+# Vectorized lookup (same rules as classify_risk)
+# ---------------------------------------------------------
+COVERAGE_BUCKETS = np.array(["ZERO", "LOW", "MEDIUM", "HIGH"], dtype=object)
+
+# Upper bounds (inclusive) of the ZERO / LOW / MEDIUM buckets, in percent
+COVERAGE_BUCKET_EDGES = [0, 30, 70]
+
+RISK_CATEGORIES = np.array(
+    ["Hidden Risk", "Refactor Candidate", "Low Value", "Safe Zone"], dtype=object
+)
+HIDDEN_RISK, REFACTOR_CANDIDATE, LOW_VALUE, SAFE_ZONE = range(len(RISK_CATEGORIES))
+
+# Row 0 = LOW smell, row 1 = HIGH smell, row 2 = any other label
+RISK_TABLE = np.array(
+    [
+        [classify_risk(smell, bucket) for bucket in COVERAGE_BUCKETS]
+        for smell in ("LOW", "HIGH", "OTHER")
+    ],
+    dtype=object,
+)
+
+# RISK_TABLE as indices into RISK_CATEGORIES
+RISK_CODE_TABLE = np.array(
+    [[list(RISK_CATEGORIES).index(risk) for risk in row] for row in RISK_TABLE],
+    dtype=np.int8,
+)
+
+
+def coverage_bucket_codes(coverage_percent) -> np.ndarray:
+    """
+    Index into COVERAGE_BUCKETS for each coverage percentage.
+    """
+    return np.digitize(coverage_percent, COVERAGE_BUCKET_EDGES, right=True)
+
+
+def smell_codes(smell_labels) -> np.ndarray:
+    """
+    Row of RISK_TABLE for each smell label (case-insensitive).
+    """
+    labels = np.char.upper(np.asarray(smell_labels, dtype=str))
+    return np.where(labels == "HIGH", 1, np.where(labels == "LOW", 0, 2))
+
+
+def risk_codes(smell_labels, bucket_codes) -> np.ndarray:
+    """
+    Index into RISK_CATEGORIES for each (smell label, coverage bucket code).
+    """
+    return RISK_CODE_TABLE[smell_codes(smell_labels), bucket_codes]
+
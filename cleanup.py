@@ -15,6 +15,7 @@ DATA_DIR = ML_ROOT / "data"
 TRAIN_FILE = DATA_DIR / "train" / "long_method_training_dataset.csv"
 VALID_FILE = DATA_DIR / "validation" / "long_method_validation_dataset.csv"
 PROCESSED_DIR = DATA_DIR / "processed"
+CACHE_DIR = DATA_DIR / "cache"
 
 MODELS_DIR = ML_ROOT / "models"
 WORKSPACE_DIR = PROJECT_ROOT / "workspace"
@@ -66,6 +67,7 @@ def main():
     print(f" - {VALID_FILE}")
     print(" - contents of ml-test-synthesis/data/processed/ (except .gitkeep)")
     print(" - coverage artifacts under ml-test-synthesis/data/")
+    print(" - cached coverage and radon metrics under ml-test-synthesis/data/cache/")
     print(" - contents of ml-test-synthesis/models/ (except .gitkeep)")
     print(" - entire <project-root>/workspace/\n")
 
@@ -84,10 +86,12 @@ def main():
     remove_dir_contents_preserve_gitkeep(PROCESSED_DIR)
 
     # 3️⃣ Remove coverage artifacts under data/
-    for pattern in ["*_coverage.json", "coverage.json", ".coverage"]:
+    for pattern in ["*_coverage.json", "*_coverage.parquet", "coverage.json", ".coverage"]:
         for p in DATA_DIR.rglob(pattern):
             remove_path(p)
 
+    remove_path(CACHE_DIR)
+
     # 4️⃣ Clean models directory contents (preserve folder + .gitkeep)
     remove_dir_contents_preserve_gitkeep(MODELS_DIR)
 
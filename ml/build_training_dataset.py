@@ -3,16 +3,24 @@ script_fixed_clean.py
 (All debug prints removed)
 """
 import os
+import io
+import mmap
 import csv
 import ast
+import math
 import random
+from bisect import bisect_left, bisect_right
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from config.paths import TRAINING_REPOS
 
 
-from radon.complexity import cc_visit
-from radon.raw import analyze as raw_analyze
-from radon.metrics import h_visit
+from ml.radon_cache import (
+    cached_cc_visit_ast,
+    cached_h_visit,
+    cached_raw_analyze,
+    source_digest,
+)
 from pathlib import Path
 from config.paths import TARGET_REPOS_DIR, TRAINING_DATA_DIR
 
@@ -26,15 +34,23 @@ OUTPUT_CSV_FILE = TRAINING_DATA_DIR / "long_method_training_dataset.csv"
 LLOC_THRESHOLD = 30
 CC_THRESHOLD = 10
 
+# Never descended into when collecting source files
+SKIP_DIRS = {"build", "dist", "__pycache__", "node_modules", "docs"}
+
 MAX_SMELLY_SAMPLES = 200
 MAX_NON_SMELLY_SAMPLES = 800
 
+# Halstead runs after sampling and can still drop a method, so each
+# reservoir holds this fraction more than its cap (see take_with_halstead)
+SAMPLE_HEADROOM = 0.1
+
 FIELDNAMES = [
     'File_Path', 'Method_Name', 'start_line', 'end_line', 'is_Long_Method',
     'CC', 'lloc', 'scloc', 'comments',
     'calculated_length', 'volume', 'difficulty',
     'effort', 'time', 'bugs'
 ]
+LABEL_INDEX = FIELDNAMES.index('is_Long_Method')
 
 # ---------- Utilities ----------
 
@@ -49,18 +65,8 @@ def is_test_path(path: str) -> bool:
 
 
 def get_node_end_lineno(node):
-    end = getattr(node, 'end_lineno', None)
-    if end is not None:
-        return end
-    max_lineno = getattr(node, 'lineno', None)
-    for child in ast.walk(node):
-        if hasattr(child, 'lineno'):
-            try:
-                if child.lineno and (max_lineno is None or child.lineno > max_lineno):
-                    max_lineno = child.lineno
-            except Exception:
-                pass
-    return max_lineno
+    # ast.parse always sets end_lineno on Python 3.8+ (README requires 3.9+)
+    return node.end_lineno
 
 
 def overlap_length(a_start, a_end, b_start, b_end):
@@ -71,42 +77,78 @@ def overlap_length(a_start, a_end, b_start, b_end):
     return max(0, end - start + 1)
 
 
-def match_cc_block_for_node(cc_blocks, node_start, node_end):
+def build_cc_index(cc_blocks):
+    # Blocks sorted by start line, plus a running max of their end lines:
+    # every block before bisect_left(max_ends, start) ends above the method.
+    entries = []
+    for order, block in enumerate(cc_blocks):
+        b_start = block.lineno
+        b_end = block.endline if block.endline is not None else b_start
+        entries.append((b_start, order, b_end, block))
+    entries.sort(key=lambda e: (e[0], e[1]))
+
+    starts = [e[0] for e in entries]
+    max_ends = []
+    for _, _, b_end, _ in entries:
+        max_ends.append(max(b_end, max_ends[-1]) if max_ends else b_end)
+    return starts, max_ends, entries
+
+
+def match_cc_block_for_node(cc_index, node_start, node_end):
+    starts, max_ends, entries = cc_index
+    lo = bisect_left(max_ends, node_start)
+    hi = bisect_right(starts, node_end)
+
     best_block = None
     best_overlap = 0
-    for block in cc_blocks:
-        b_start = getattr(block, 'lineno', None)
-        b_end = getattr(block, 'endline', None)
-        if b_end is None:
-            b_end = b_start
+    best_order = None
+    for b_start, order, b_end, block in entries[lo:hi]:
         ol = overlap_length(node_start, node_end, b_start, b_end)
-        if ol > best_overlap:
+        # Ties go to the block radon listed first, as in a linear scan
+        if ol > best_overlap or (ol and ol == best_overlap and order < best_order):
             best_overlap = ol
             best_block = block
+            best_order = order
     if best_block is None or best_overlap == 0:
         return None
-    try:
-        return best_block.complexity
-    except Exception:
-        return getattr(best_block, 'complexity', getattr(best_block, 'cc', None))
+    return best_block.complexity
+
+
+def split_source_lines(content):
+    # Same line breaks as the parser (\r\n, \r, \n but not form feed), so
+    # node line numbers index straight into the result
+    return io.StringIO(content, newline='').readlines()
+
+
+def _byte_slice(line, start=None, stop=None):
+    # ast column offsets count UTF-8 bytes
+    if line.isascii():
+        return line[start:stop]
+    return line.encode()[start:stop].decode()
 
 
-def get_method_source(content, node):
+def get_source_segment(lines, node):
+    # ast.get_source_segment over pre-split lines; the stdlib version splits
+    # the whole file again on every call
+    start = node.lineno - 1
+    end = node.end_lineno - 1
+    if start == end:
+        return _byte_slice(lines[start], node.col_offset, node.end_col_offset)
+    return (
+        _byte_slice(lines[start], node.col_offset)
+        + ''.join(lines[start + 1:end])
+        + _byte_slice(lines[end], None, node.end_col_offset)
+    )
+
+
+def get_method_source(lines, node):
     try:
-        src = ast.get_source_segment(content, node)
+        src = get_source_segment(lines, node)
         if src:
             return src
     except Exception:
         pass
-    lines = content.splitlines(keepends=True)
-    start = getattr(node, 'lineno', None)
-    end = get_node_end_lineno(node)
-    if start is None or end is None:
-        return None
-    try:
-        return ''.join(lines[start - 1:end])
-    except Exception:
-        return None
+    return ''.join(lines[node.lineno - 1:get_node_end_lineno(node)])
 
 # ---------- Label -----------
 
@@ -115,104 +157,188 @@ def get_smell_label(lloc, cc):
 
 # ---------- Analysis per method ----------
 
-def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
+def analyze_method(node, source_lines, cc_index, file_path, counters=None):
     method_name = node.name
-    node_start = getattr(node, 'lineno', None)
+    node_start = node.lineno
     node_end = get_node_end_lineno(node)
-    method_code = get_method_source(file_content, node)
+    method_code = get_method_source(source_lines, node)
     if not method_code:
         if counters is not None:
             counters['skip_source'] += 1
         return None
-    cc = match_cc_block_for_node(full_cc_list, node_start, node_end)
+    cc = match_cc_block_for_node(cc_index, node_start, node_end)
     if cc is None:
         if counters is not None:
             counters['skip_cc'] += 1
         return None
     try:
-        raw = raw_analyze(method_code)
-        lloc = getattr(raw, 'lloc', None)
-        scloc = getattr(raw, 'sloc', None) or getattr(raw, 'sloc', 0)
-        comments = getattr(raw, 'comments', 0)
+        method_digest = source_digest(method_code)
+        raw = cached_raw_analyze(method_code, method_digest)
+        lloc = raw.lloc
+        scloc = raw.sloc
+        comments = raw.comments
     except Exception:
         if counters is not None:
             counters['skip_raw'] += 1
         return None
+    if counters is not None:
+        counters['added'] += 1
+    # Halstead metrics play no part in the label, so they are only computed
+    # for the rows that survive sampling (see add_halstead_metrics). The row
+    # holds the FIELDNAMES columns up to 'comments', in order.
+    row = (
+        file_path.replace('\\', '/'),
+        method_name,
+        node_start,
+        node_end,
+        get_smell_label(lloc, cc),
+        cc,
+        lloc,
+        scloc,
+        comments,
+    )
+    return row, method_code, method_digest
+
+
+def add_halstead_metrics(method, counters=None):
+    row, method_code, method_digest = method
     try:
-        hal_reports = h_visit(method_code)
+        hal_reports = cached_h_visit(method_code, method_digest)
         if hal_reports:
             hal = hal_reports[0]
-            calculated_length = getattr(hal, 'length', None)
-            if calculated_length is None:
-                N1 = getattr(hal, 'N1', None)
-                N2 = getattr(hal, 'N2', None)
-                if N1 is not None and N2 is not None:
-                    calculated_length = N1 + N2
-            volume = getattr(hal, 'volume', None)
-            difficulty = getattr(hal, 'difficulty', None)
-            effort = getattr(hal, 'effort', None)
-            time_metric = getattr(hal, 'time', None)
-            bugs = getattr(hal, 'bugs', None)
+            # Halstead length (N1 + N2), not radon's calculated_length
+            calculated_length = hal.length
+            volume = hal.volume
+            difficulty = hal.difficulty
+            effort = hal.effort
+            time_metric = hal.time
+            bugs = hal.bugs
         else:
             calculated_length = volume = difficulty = effort = time_metric = bugs = None
     except Exception:
         if counters is not None:
             counters['skip_halstead'] += 1
         return None
-    if counters is not None:
-        counters['added'] += 1
-    return {
-        'File_Path': file_path.replace('\\', '/'),
-        'Method_Name': method_name,
-        'start_line': node_start,
-        'end_line': node_end,
-        'is_Long_Method': get_smell_label(lloc, cc),
-        'CC': cc,
-        'lloc': lloc,
-        'scloc': scloc,
-        'comments': comments,
-        'calculated_length': calculated_length,
-        'volume': volume,
-        'difficulty': difficulty,
-        'effort': effort,
-        'time': time_metric,
-        'bugs': bugs
-    }
+    return row + (calculated_length, volume, difficulty, effort, time_metric, bugs)
 
 # ---------- File processing ----------
 
-def process_file(file_path, counters=None):
+# Larger files are generated code or data, not meaningful modules
+MAX_SOURCE_BYTES = 2 * 1024 * 1024
+
+
+def read_source(file_path):
+    # Decoded straight from a read-only mapping, with no intermediate bytes
+    # copy. None if the file is over MAX_SOURCE_BYTES; I/O and UTF-8 errors
+    # raise as open().read() did.
+    with open(file_path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size > MAX_SOURCE_BYTES:
+            return None
+        if size == 0:
+            return ''
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            content = str(mm, 'utf-8')
+    # Universal newlines, as text-mode open() applied
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+# Returns (rows, counters) rather than updating shared state, so it can
+# run in a worker process.
+def process_file(file_path):
     rows = []
-    if counters is None:
-        counters = Counter()
+    counters = Counter()
     try:
-        with open(file_path, 'r', encoding='utf-8') as fh:
-            content = fh.read()
+        content = read_source(file_path)
     except Exception:
         counters['fail_read'] += 1
-        return rows
+        return rows, counters
+    if content is None:
+        counters['skip_large'] += 1
+        return rows, counters
     try:
         tree = ast.parse(content)
     except Exception:
         counters['fail_parse'] += 1
-        return rows
+        return rows, counters
     try:
-        full_cc_list = cc_visit(content)
+        full_cc_list = cached_cc_visit_ast(tree, source_digest(content))
     except Exception:
         counters['fail_cc_visit'] += 1
         full_cc_list = []
+    cc_index = build_cc_index(full_cc_list)
+    source_lines = split_source_lines(content)
     for node in ast.walk(tree):
         if isinstance(node, ast.FunctionDef):
-            res = analyze_method(node, content, full_cc_list, file_path, counters=counters)
+            res = analyze_method(node, source_lines, cc_index, file_path, counters=counters)
             if res:
                 rows.append(res)
+    return rows, counters
+
+# ---------- Sampling ----------
+
+def reservoir_add(reservoir, seen, item, size):
+    # Algorithm R: seen counts item itself; every item so far stays in the
+    # reservoir with probability size / seen
+    if len(reservoir) < size:
+        reservoir.append(item)
+    else:
+        j = random.randrange(seen)
+        if j < size:
+            reservoir[j] = item
+
+def reservoir_size(cap):
+    return cap + math.ceil(cap * SAMPLE_HEADROOM)
+
+
+def take_with_halstead(methods, cap, counters=None):
+    # Visit the sampled methods in random order until cap of them have
+    # Halstead metrics; any uniform subset of a uniform sample is uniform
+    random.shuffle(methods)
+    rows = []
+    for method in methods:
+        if len(rows) == cap:
+            break
+        row = add_halstead_metrics(method, counters=counters)
+        if row is not None:
+            rows.append(row)
     return rows
 
 # ---------- Build dataset ----------
 
+def iter_py_files(dir_path):
+    # Top-down like os.walk (files of a directory, then its subdirectories),
+    # with each directory listed once by os.scandir and SKIP_DIRS never entered
+    dir_path = os.fspath(dir_path)
+    py_files, subdirs = [], []
+    collect = not is_test_path(dir_path)
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    name = entry.name
+                    if not name.startswith('.') and name not in SKIP_DIRS and not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif collect and entry.name.endswith('.py'):
+                    py_files.append(entry.path)
+    except OSError:
+        return
+
+    yield from py_files
+    for subdir in subdirs:
+        yield from iter_py_files(subdir)
+
+
 def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
-    all_rows = []
+    smelly_sampled = []
+    non_smelly_sampled = []
+    n_smelly = n_non_smelly = 0
     counters = Counter()
+    file_paths = []
 
     for repo_path in projects_root.iterdir():
         if not repo_path.is_dir():
@@ -224,44 +350,36 @@ def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
 
 
         print(f"Processing training repo: {repo_name}")
-
-        for root, dirs, files in os.walk(repo_path):
-            if is_test_path(root):
-                continue
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    rows = process_file(file_path, counters=counters)
-                    all_rows.extend(rows)
-
-    # ---- sampling logic unchanged ----
-    smelly_list = [r for r in all_rows if r.get('is_Long_Method') == 1]
-    non_smelly_list = [r for r in all_rows if r.get('is_Long_Method') == 0]
-
-    if len(smelly_list) > MAX_SMELLY_SAMPLES:
-        smelly_sampled = random.sample(smelly_list, MAX_SMELLY_SAMPLES)
-    else:
-        smelly_sampled = smelly_list
-
-    if len(non_smelly_list) > MAX_NON_SMELLY_SAMPLES:
-        non_smelly_sampled = random.sample(non_smelly_list, MAX_NON_SMELLY_SAMPLES)
-    else:
-        non_smelly_sampled = non_smelly_list
-
-    final_data = smelly_sampled + non_smelly_sampled
+        file_paths.extend(iter_py_files(repo_path))
+
+    # Files are independent and CPU-bound; map() keeps the walk order.
+    # Methods are sampled as they arrive, so at most the two reservoir
+    # sizes' worth of them are ever held.
+    with ProcessPoolExecutor() as executor:
+        for rows, file_counters in executor.map(process_file, file_paths, chunksize=32):
+            counters.update(file_counters)
+            for method in rows:
+                if method[0][LABEL_INDEX] == 1:
+                    n_smelly += 1
+                    reservoir_add(smelly_sampled, n_smelly, method, reservoir_size(MAX_SMELLY_SAMPLES))
+                else:
+                    n_non_smelly += 1
+                    reservoir_add(non_smelly_sampled, n_non_smelly, method, reservoir_size(MAX_NON_SMELLY_SAMPLES))
+
+    smelly_rows = take_with_halstead(smelly_sampled, MAX_SMELLY_SAMPLES, counters)
+    non_smelly_rows = take_with_halstead(non_smelly_sampled, MAX_NON_SMELLY_SAMPLES, counters)
+    final_data = smelly_rows + non_smelly_rows
     random.shuffle(final_data)
 
-    print(f"Smelly samples collected: {len(smelly_sampled)}")
-    print(f"Non-smelly samples collected: {len(non_smelly_sampled)}")
+    print(f"Smelly samples collected: {len(smelly_rows)}")
+    print(f"Non-smelly samples collected: {len(non_smelly_rows)}")
     print(f"Final dataset size: {len(final_data)}")
 
     output_csv.parent.mkdir(parents=True, exist_ok=True)
 
     with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES)
         writer.writerows(final_data)
 
 
@@ -4,14 +4,21 @@ script_metrics_only.py
 (Extracts metrics for all methods, no classification, no sampling)
 """
 import os
+import io
+import mmap
 import csv
 import ast
+from bisect import bisect_left, bisect_right
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 from config.paths import VALIDATION_REPOS
-from radon.complexity import cc_visit
-from radon.raw import analyze as raw_analyze
-from radon.metrics import h_visit
+from ml.radon_cache import (
+    cached_cc_visit_ast,
+    cached_h_visit,
+    cached_raw_analyze,
+    source_digest,
+)
 from pathlib import Path
 from config.paths import TARGET_REPOS_DIR, VALIDATION_DATA_DIR
 
@@ -20,6 +27,9 @@ OUTPUT_CSV_FILE = VALIDATION_DATA_DIR / "long_method_validation_dataset.csv"
 
 VALIDATION_REPOS = {"attrs", "jinja2", "itsdangerous"}
 
+# Never descended into when collecting source files
+SKIP_DIRS = {"build", "dist", "__pycache__", "node_modules", "docs"}
+
 FIELDNAMES = [
     'File_Path', 'Method_Name', 'start_line', 'end_line',
     'CC', 'lloc', 'scloc', 'comments',
@@ -43,18 +53,8 @@ def is_test_path(path: str, filename: str = "") -> bool:
 
 
 def get_node_end_lineno(node):
-    end = getattr(node, 'end_lineno', None)
-    if end is not None:
-        return end
-    max_lineno = getattr(node, 'lineno', None)
-    for child in ast.walk(node):
-        if hasattr(child, 'lineno'):
-            try:
-                if child.lineno and (max_lineno is None or child.lineno > max_lineno):
-                    max_lineno = child.lineno
-            except Exception:
-                pass
-    return max_lineno
+    # ast.parse always sets end_lineno on Python 3.8+ (README requires 3.9+)
+    return node.end_lineno
 
 
 def overlap_length(a_start, a_end, b_start, b_end):
@@ -65,87 +65,121 @@ def overlap_length(a_start, a_end, b_start, b_end):
     return max(0, end - start + 1)
 
 
-def match_cc_block_for_node(cc_blocks, node_start, node_end):
+def build_cc_index(cc_blocks):
+    # Blocks sorted by start line, plus a running max of their end lines:
+    # every block before bisect_left(max_ends, start) ends above the method.
+    entries = []
+    for order, block in enumerate(cc_blocks):
+        b_start = block.lineno
+        b_end = block.endline if block.endline is not None else b_start
+        entries.append((b_start, order, b_end, block))
+    entries.sort(key=lambda e: (e[0], e[1]))
+
+    starts = [e[0] for e in entries]
+    max_ends = []
+    for _, _, b_end, _ in entries:
+        max_ends.append(max(b_end, max_ends[-1]) if max_ends else b_end)
+    return starts, max_ends, entries
+
+
+def match_cc_block_for_node(cc_index, node_start, node_end):
+    starts, max_ends, entries = cc_index
+    lo = bisect_left(max_ends, node_start)
+    hi = bisect_right(starts, node_end)
+
     best_block = None
     best_overlap = 0
-    for block in cc_blocks:
-        b_start = getattr(block, 'lineno', None)
-        b_end = getattr(block, 'endline', None)
-        if b_end is None:
-            b_end = b_start
+    best_order = None
+    for b_start, order, b_end, block in entries[lo:hi]:
         ol = overlap_length(node_start, node_end, b_start, b_end)
-        if ol > best_overlap:
+        # Ties go to the block radon listed first, as in a linear scan
+        if ol > best_overlap or (ol and ol == best_overlap and order < best_order):
             best_overlap = ol
             best_block = block
+            best_order = order
     if best_block is None or best_overlap == 0:
         return None
-    try:
-        return best_block.complexity
-    except Exception:
-        return getattr(best_block, 'complexity', getattr(best_block, 'cc', None))
+    return best_block.complexity
+
+
+def split_source_lines(content):
+    # Same line breaks as the parser (\r\n, \r, \n but not form feed), so
+    # node line numbers index straight into the result
+    return io.StringIO(content, newline='').readlines()
+
+
+def _byte_slice(line, start=None, stop=None):
+    # ast column offsets count UTF-8 bytes
+    if line.isascii():
+        return line[start:stop]
+    return line.encode()[start:stop].decode()
 
 
-def get_method_source(content, node):
+def get_source_segment(lines, node):
+    # ast.get_source_segment over pre-split lines; the stdlib version splits
+    # the whole file again on every call
+    start = node.lineno - 1
+    end = node.end_lineno - 1
+    if start == end:
+        return _byte_slice(lines[start], node.col_offset, node.end_col_offset)
+    return (
+        _byte_slice(lines[start], node.col_offset)
+        + ''.join(lines[start + 1:end])
+        + _byte_slice(lines[end], None, node.end_col_offset)
+    )
+
+
+def get_method_source(lines, node):
     try:
-        src = ast.get_source_segment(content, node)
+        src = get_source_segment(lines, node)
         if src:
             return src
     except Exception:
         pass
-    lines = content.splitlines(keepends=True)
-    start = getattr(node, 'lineno', None)
-    end = get_node_end_lineno(node)
-    if start is None or end is None:
-        return None
-    try:
-        return ''.join(lines[start - 1:end])
-    except Exception:
-        return None
+    return ''.join(lines[node.lineno - 1:get_node_end_lineno(node)])
 
 # ---------- Analysis per method ----------
 
-def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
+def analyze_method(node, source_lines, cc_index, file_path, counters=None):
     method_name = node.name
-    node_start = getattr(node, 'lineno', None)
+    node_start = node.lineno
     node_end = get_node_end_lineno(node)
 
-    method_code = get_method_source(file_content, node)
+    method_code = get_method_source(source_lines, node)
     if not method_code:
         if counters is not None:
             counters['skip_source'] += 1
         return None
 
-    cc = match_cc_block_for_node(full_cc_list, node_start, node_end)
+    cc = match_cc_block_for_node(cc_index, node_start, node_end)
     if cc is None:
         if counters is not None:
             counters['skip_cc'] += 1
         return None
 
     try:
-        raw = raw_analyze(method_code)
-        lloc = getattr(raw, 'lloc', None)
-        scloc = getattr(raw, 'sloc', None) or getattr(raw, 'sloc', 0)
-        comments = getattr(raw, 'comments', 0)
+        method_digest = source_digest(method_code)
+        raw = cached_raw_analyze(method_code, method_digest)
+        lloc = raw.lloc
+        scloc = raw.sloc
+        comments = raw.comments
     except Exception:
         if counters is not None:
             counters['skip_raw'] += 1
         return None
 
     try:
-        hal_reports = h_visit(method_code)
+        # The parsed node, not method_code: no second parse of the method
+        hal_reports = cached_h_visit(node, method_digest)
         if hal_reports:
             hal = hal_reports[0]
-            calculated_length = getattr(hal, 'length', None)
-            if calculated_length is None:
-                N1 = getattr(hal, 'N1', None)
-                N2 = getattr(hal, 'N2', None)
-                if N1 is not None and N2 is not None:
-                    calculated_length = N1 + N2
-            volume = getattr(hal, 'volume', None)
-            difficulty = getattr(hal, 'difficulty', None)
-            effort = getattr(hal, 'effort', None)
-            time_metric = getattr(hal, 'time', None)
-            bugs = getattr(hal, 'bugs', None)
+            # Halstead length (N1 + N2), not radon's calculated_length
+            calculated_length = hal.length
+            volume = hal.volume
+            difficulty = hal.difficulty
+            effort = hal.effort
+            time_metric = hal.time
+            bugs = hal.bugs
         else:
             calculated_length = volume = difficulty = effort = time_metric = bugs = None
     except Exception:
@@ -156,60 +190,117 @@ def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
     if counters is not None:
         counters['added'] += 1
 
-    return {
-        'File_Path': file_path.replace('\\', '/'),
-        'Method_Name': method_name,
-        'start_line': node_start,
-        'end_line': node_end,
-        'CC': cc,
-        'lloc': lloc,
-        'scloc': scloc,
-        'comments': comments,
-        'calculated_length': calculated_length,
-        'volume': volume,
-        'difficulty': difficulty,
-        'effort': effort,
-        'time': time_metric,
-        'bugs': bugs
-    }
+    # One value per FIELDNAMES column, in order
+    return (
+        file_path.replace('\\', '/'),
+        method_name,
+        node_start,
+        node_end,
+        cc,
+        lloc,
+        scloc,
+        comments,
+        calculated_length,
+        volume,
+        difficulty,
+        effort,
+        time_metric,
+        bugs,
+    )
 
 # ---------- File processing ----------
 
-def process_file(file_path, counters=None):
+# Larger files are generated code or data, not meaningful modules
+MAX_SOURCE_BYTES = 2 * 1024 * 1024
+
+
+def read_source(file_path):
+    # Decoded straight from a read-only mapping, with no intermediate bytes
+    # copy. None if the file is over MAX_SOURCE_BYTES; I/O and UTF-8 errors
+    # raise as open().read() did.
+    with open(file_path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size > MAX_SOURCE_BYTES:
+            return None
+        if size == 0:
+            return ''
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            content = str(mm, 'utf-8')
+    # Universal newlines, as text-mode open() applied
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+# Returns (rows, counters) rather than updating shared state, so it can
+# run in a worker process.
+def process_file(file_path):
     rows = []
-    if counters is None:
-        counters = Counter()
+    counters = Counter()
     try:
-        with open(file_path, 'r', encoding='utf-8') as fh:
-            content = fh.read()
+        content = read_source(file_path)
     except Exception:
         counters['fail_read'] += 1
-        return rows
+        return rows, counters
+    if content is None:
+        counters['skip_large'] += 1
+        return rows, counters
 
     try:
         tree = ast.parse(content)
     except Exception:
         counters['fail_parse'] += 1
-        return rows
+        return rows, counters
 
     try:
-        full_cc_list = cc_visit(content)
+        full_cc_list = cached_cc_visit_ast(tree, source_digest(content))
     except Exception:
         counters['fail_cc_visit'] += 1
         full_cc_list = []
+    cc_index = build_cc_index(full_cc_list)
+    source_lines = split_source_lines(content)
 
     for node in ast.walk(tree):
         if isinstance(node, ast.FunctionDef):
-            res = analyze_method(node, content, full_cc_list, file_path, counters=counters)
+            res = analyze_method(node, source_lines, cc_index, file_path, counters=counters)
             if res:
                 rows.append(res)
-    return rows
+    return rows, counters
 
 # ---------- Build dataset ----------
 
+def iter_py_files(dir_path):
+    # Top-down like os.walk (files of a directory, then its subdirectories),
+    # with each directory listed once by os.scandir and SKIP_DIRS never entered
+    dir_path = os.fspath(dir_path)
+    py_files, subdirs = [], []
+    collect = not is_test_path(dir_path) # Skip if the whole directory is a test dir
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                name = entry.name
+                if is_dir:
+                    # Prune directory search
+                    if (not name.startswith('.') and not "test" in name.lower()
+                            and name not in SKIP_DIRS and not entry.is_symlink()):
+                        subdirs.append(entry.path)
+                # Also check the individual filename
+                elif collect and name.endswith('.py') and not is_test_path(dir_path, name):
+                    py_files.append(entry.path)
+    except OSError:
+        return
+
+    yield from py_files
+    for subdir in subdirs:
+        yield from iter_py_files(subdir)
+
+
 def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
     all_rows = []
     counters = Counter()
+    file_paths = []
 
     for repo_path in projects_root.iterdir():
         if not repo_path.is_dir():
@@ -220,32 +311,21 @@ def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
             continue
 
         print(f"Processing evaluation repo: {repo_name}")
+        file_paths.extend(iter_py_files(repo_path))
 
-        for root, dirs, files in os.walk(repo_path):
-            # Prune directory search
-            dirs[:] = [d for d in dirs if not d.startswith('.') and not "test" in d.lower()]
-            
-            if is_test_path(root): # Skip if the whole directory is a test dir
-                continue
-
-            for file in files:
-                if file.endswith('.py'):
-                    # NEW: Also check the individual filename
-                    if is_test_path(root, file):
-                        continue
-                        
-                    file_path = os.path.join(root, file)
-                    # ... process file ...
-                    rows = process_file(file_path, counters=counters)
-                    all_rows.extend(rows)
+    # Files are independent and CPU-bound; map() keeps the walk order
+    with ProcessPoolExecutor() as executor:
+        for rows, file_counters in executor.map(process_file, file_paths, chunksize=32):
+            all_rows.extend(rows)
+            counters.update(file_counters)
 
     print(f"Total methods collected: {len(all_rows)}")
 
     output_csv.parent.mkdir(parents=True, exist_ok=True)
 
     with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES)
         writer.writerows(all_rows)
 
     print(f"Dataset written to: {output_csv}")
@@ -1,6 +1,7 @@
 import pandas as pd
 import joblib
 import numpy as np
+from sklearn.preprocessing import MinMaxScaler
 from config.paths import MODELS_DIR, VALIDATION_DATA_DIR, PROCESSED_DATA_DIR
 
 # --- 1. Config ---
@@ -11,43 +12,80 @@ output_file = PROCESSED_DATA_DIR / "ml_smell_predictions.csv" # Renamed for clar
 
 necessary_features = ['scloc', 'lloc', 'effort', 'time', 'bugs', 'volume', 'difficulty', 'calculated_length']
 
-try:
-    # --- 2. Load Resources ---
-    df_new = pd.read_csv(unseen_file, encoding='latin1')
-    clf = joblib.load(model_filename)
-    scaler = joblib.load(scaler_filename)
-
-    # --- 3. Preprocessing ---
-    X_new = df_new[necessary_features].fillna(0) # Safety first
-    X_new_scaled = scaler.transform(X_new)
-
-    # --- 4. Prediction ---
-    preds = clf.predict(X_new_scaled)
-    # We keep probability ONLY for logging/metadata, NOT for decision making
-    probs = clf.predict_proba(X_new_scaled)[:, 1] 
-
-    # --- 5. Clean Mapping (The Hard Line) ---
-    # Map 1 -> HIGH, 0 -> LOW to match risk.py expectations
-    df_new['smell_label'] = np.where(preds == 1, "HIGH", "LOW")
-    
-    # Optional: Keep the raw probability for the final report CSV, 
-    # but ensure it's not used for "Risk" logic here.
-    df_new['ml_confidence'] = np.round(probs, 4)
-
-    # --- 6. Output Generation ---
-    # We do NOT sort by probability. We keep the original order or sort by Method_Name.
-    final_report = df_new.sort_values(by='Method_Name')
-
-    cols_to_show = ['Method_Name', 'smell_label', 'ml_confidence']
-    if 'File_Path' in final_report.columns:
-        cols_to_show.insert(0, 'File_Path')
-
-    print("\n--- 🎯 ML Smell Detection Results ---")
-    print(final_report[cols_to_show].head(10))
-
-    # Save to CSV - this will be read by your analysis module
-    final_report.to_csv(output_file, index=False)
-    print(f"\n✅ Predictions complete. Output saved to: {output_file}")
-
-except Exception as e:
-    print(f"❌ An error occurred: {e}")
\ No newline at end of file
+# Rows scored per chunk; bounds peak memory on large validation sets
+CHUNK_SIZE = 50_000
+
+
+def scale_features(scaler, X):
+    # MinMaxScaler.transform is X * scale_ + min_; applied in place on the
+    # chunk's own array, without sklearn's input validation and copy
+    if isinstance(scaler, MinMaxScaler) and not scaler.clip:
+        X *= scaler.scale_
+        X += scaler.min_
+        return X
+    return scaler.transform(X)
+
+
+def predict_with_confidence(clf, X):
+    # One decision_function pass gives both outputs: the label is its sign
+    # (what predict() does for a binary SVM), and the confidence its
+    # logistic squash, so 0.5 sits on the decision boundary. That is a
+    # monotone decision-score confidence, NOT a calibrated probability.
+    # Models saved with predict_proba (probability=True) keep their Platt
+    # probabilities.
+    scores = clf.decision_function(X)
+    preds = clf.classes_[(scores > 0).astype(np.intp)]
+    if hasattr(clf, "predict_proba"):
+        return preds, clf.predict_proba(X)[:, 1]
+    return preds, 1.0 / (1.0 + np.exp(-scores))
+
+
+def main():
+    try:
+        # --- 2. Load Resources ---
+        clf = joblib.load(model_filename)
+        scaler = joblib.load(scaler_filename)
+
+        # Save to CSV - this will be read by your analysis module.
+        # We do NOT sort: rows keep the validation dataset order, which lets
+        # every chunk be written as soon as it is scored.
+        with open(output_file, 'w', newline='', encoding='utf-8') as out:
+            chunks = pd.read_csv(unseen_file, encoding='latin1', chunksize=CHUNK_SIZE)
+            for i, df_new in enumerate(chunks):
+                # --- 3. Preprocessing ---
+                # Fresh float64 array, NaN -> 0 (safety first)
+                X_new = df_new[necessary_features].to_numpy(dtype=np.float64, na_value=0.0)
+                X_new_scaled = scale_features(scaler, X_new)
+
+                # --- 4. Prediction ---
+                # We keep confidence ONLY for logging/metadata, NOT for decision making
+                preds, confidence = predict_with_confidence(clf, X_new_scaled)
+
+                # --- 5. Clean Mapping (The Hard Line) ---
+                # Map 1 -> HIGH, 0 -> LOW to match risk.py expectations
+                df_new['smell_label'] = np.where(preds == 1, "HIGH", "LOW")
+
+                # Optional: Keep the decision-score confidence (sigmoid of the
+                # SVM margin, not a calibrated probability) for the final
+                # report CSV, but ensure it's not used for "Risk" logic here.
+                df_new['ml_confidence'] = np.round(confidence, 4)
+
+                # --- 6. Output Generation ---
+                if i == 0:
+                    cols_to_show = ['Method_Name', 'smell_label', 'ml_confidence']
+                    if 'File_Path' in df_new.columns:
+                        cols_to_show.insert(0, 'File_Path')
+
+                    print("\n--- 🎯 ML Smell Detection Results ---")
+                    print(df_new[cols_to_show].head(10))
+
+                df_new.to_csv(out, header=(i == 0), index=False)
+
+        print(f"\n✅ Predictions complete. Output saved to: {output_file}")
+
+    except Exception as e:
+        print(f"❌ An error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
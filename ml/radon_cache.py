@@ -0,0 +1,88 @@
+"""
+Disk memoization of radon metrics, shared by the training and validation
+dataset builds.
+
+Entries are keyed by a blake2b digest of the analysed source, so a file or
+method that is unchanged since the last run (or that the other build has
+already analysed) is read back instead of walked again. Every entry is a
+row in one SQLite file, data/cache/radon-<radon version>.sqlite, rather
+than a directory per call, so a large repo costs one file on disk and
+upgrading radon starts clean.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+
+import radon
+from radon.complexity import cc_visit_ast
+from radon.metrics import h_visit, h_visit_ast
+from radon.raw import analyze as raw_analyze
+
+from config.paths import DATA_DIR
+
+RADON_CACHE_FILE = DATA_DIR / "cache" / f"radon-{radon.__version__}.sqlite"
+
+# One connection per process: the dataset builds analyse files in worker
+# processes, and an SQLite connection must not cross a fork
+_connection = None
+_connection_pid = None
+
+
+def _db():
+    global _connection, _connection_pid
+    if _connection is None or _connection_pid != os.getpid():
+        os.makedirs(RADON_CACHE_FILE.parent, exist_ok=True)
+        # Workers write concurrently; WAL lets readers proceed during a
+        # write and the timeout waits out the others' short write locks
+        _connection = sqlite3.connect(RADON_CACHE_FILE, timeout=60)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        # A commit lost to a crash only costs a recomputation
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "kind TEXT NOT NULL, digest TEXT NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (kind, digest)) WITHOUT ROWID"
+        )
+        _connection_pid = os.getpid()
+    return _connection
+
+
+def _memoized(kind, digest, compute):
+    # Exceptions from compute propagate and nothing is stored, as before
+    db = _db()
+    row = db.execute(
+        "SELECT value FROM metrics WHERE kind = ? AND digest = ?", (kind, digest)
+    ).fetchone()
+    if row is not None:
+        return pickle.loads(row[0])
+    value = compute()
+    with db:
+        db.execute(
+            "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)",
+            (kind, digest, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+    return value
+
+
+def source_digest(source: str) -> str:
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def cached_cc_visit_ast(tree, digest):
+    # tree is the module already parsed by the caller; digest is that of
+    # the source it was parsed from
+    return _memoized("cc", digest, lambda: cc_visit_ast(tree))
+
+
+def cached_raw_analyze(source, digest=None):
+    return _memoized("raw", digest or source_digest(source), lambda: raw_analyze(source))
+
+
+# code is either method source or its already-parsed FunctionDef node.
+# Both give the same report (radon's Halstead visitor only reads the body),
+# so the two share cache entries. digest is required when code is a node.
+def cached_h_visit(code, digest=None):
+    if isinstance(code, str):
+        return _memoized("halstead", digest or source_digest(code), lambda: h_visit(code))
+    return _memoized("halstead", digest, lambda: h_visit_ast(code))
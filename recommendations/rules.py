@@ -1,3 +1,16 @@
+import numpy as np
+import pandas as pd
+
+REC_HIDDEN_RISK = "Write tests immediately before modifying this code"
+REC_SMOKE_TESTS = "Add basic smoke tests to ensure execution paths are covered"
+REC_BOUNDARY_TESTS = "Increase coverage by adding input boundary tests"
+REC_BRANCH_TESTS = "Add branch and conditional path tests due to high cyclomatic complexity"
+REC_DECOMPOSE = "Consider decomposing this method; add focused unit tests per responsibility"
+REC_MOCK_DEPS = "Mock external dependencies to isolate complex logic during testing"
+REC_SAFE_REFACTOR = "Safe to refactor after ensuring existing tests capture current behavior"
+REC_NO_ACTION = "No immediate testing action required"
+
+
 def recommend_tests(function: dict) -> list:
     """
     function dict may contain:
@@ -19,31 +32,98 @@ def recommend_tests(function: dict) -> list:
 
     # Absolute priority
     if risk == "Hidden Risk":
-        recs.append("Write tests immediately before modifying this code")
+        recs.append(REC_HIDDEN_RISK)
 
     # Coverage-driven guidance
     if coverage == "ZERO":
-        recs.append("Add basic smoke tests to ensure execution paths are covered")
+        recs.append(REC_SMOKE_TESTS)
 
     if coverage in ("ZERO", "LOW"):
-        recs.append("Increase coverage by adding input boundary tests")
+        recs.append(REC_BOUNDARY_TESTS)
 
     # Complexity-driven guidance
     if cc >= 10:
-        recs.append("Add branch and conditional path tests due to high cyclomatic complexity")
+        recs.append(REC_BRANCH_TESTS)
 
     if lloc >= 30:
-        recs.append("Consider decomposing this method; add focused unit tests per responsibility")
+        recs.append(REC_DECOMPOSE)
 
     if difficulty >= 20:
-        recs.append("Mock external dependencies to isolate complex logic during testing")
+        recs.append(REC_MOCK_DEPS)
 
     # Refactor guidance
     if risk == "Refactor Candidate":
-        recs.append("Safe to refactor after ensuring existing tests capture current behavior")
+        recs.append(REC_SAFE_REFACTOR)
 
     # Fallback (avoid empty output)
     if not recs:
-        recs.append("No immediate testing action required")
+        recs.append(REC_NO_ACTION)
 
     return recs
+
+
+# ---------------------------------------------------------
+# Vectorized lookup (same rules as recommend_tests)
+# ---------------------------------------------------------
+# Rule texts in recommend_tests order; bit i of a recommendation id is set
+# when rule i fires
+RULE_TEXTS = (
+    REC_HIDDEN_RISK,
+    REC_SMOKE_TESTS,
+    REC_BOUNDARY_TESTS,
+    REC_BRANCH_TESTS,
+    REC_DECOMPOSE,
+    REC_MOCK_DEPS,
+    REC_SAFE_REFACTOR,
+)
+
+# Joined recommendation text for every possible id
+REC_TABLE = np.array(
+    [
+        "; ".join(t for bit, t in enumerate(RULE_TEXTS) if rec_id >> bit & 1)
+        or REC_NO_ACTION
+        for rec_id in range(1 << len(RULE_TEXTS))
+    ],
+    dtype=object,
+)
+
+
+def _as_float(values, n: int) -> np.ndarray:
+    # Missing values become NaN, which fails every threshold like in pandas
+    if np.ndim(values) == 0:
+        return np.full(n, values, dtype=np.float64)
+    return pd.Series(values).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def recommendation_ids(
+    hidden_risk,
+    refactor_candidate,
+    zero_coverage,
+    low_coverage,
+    cc=0,
+    lloc=0,
+    difficulty=0,
+) -> np.ndarray:
+    """
+    Bitmask of the recommend_tests rules that fire, one id per row; index
+    REC_TABLE with it for the text.
+
+    The first four arguments are boolean arrays (low_coverage: bucket ZERO
+    or LOW). cc / lloc / difficulty are numeric columns or scalars.
+    """
+    n = len(hidden_risk)
+    fired = (
+        hidden_risk,
+        zero_coverage,
+        low_coverage,
+        _as_float(cc, n) >= 10,
+        _as_float(lloc, n) >= 30,
+        _as_float(difficulty, n) >= 20,
+        refactor_candidate,
+    )
+
+    ids = np.zeros(n, dtype=np.uint8)
+    for bit, mask in enumerate(fired):
+        ids[np.asarray(mask, dtype=bool)] |= 1 << bit
+    return ids
+
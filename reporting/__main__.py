@@ -0,0 +1,47 @@
+"""
+Generates every report in one process tree: python -m reporting
+
+Each dataset is loaded and cleaned once. The figures are independent of
+one another, so each is rendered by a separate worker process. The
+numbered scripts can still be run on their own.
+"""
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from reporting._io import REPORTS_DIR, load_final, load_ml
+
+# Module names start with a digit, so they cannot be imported by statement
+final_results = importlib.import_module("reporting.1_final_results_visualization")
+ml_smells = importlib.import_module("reporting.2_ml_smell_visualizations")
+
+
+def _render(task):
+    # Unpickling the plot imports its script, and with it reporting._plot,
+    # so a worker has the Agg backend and theme whether forked or spawned
+    plot, df = task
+    plot(df)
+
+
+def main():
+    df_final = load_final()
+    df_ml = load_ml()
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+    tasks = []
+    if df_final is not None:
+        tasks += [(plot, df_final) for plot in final_results.PLOTS]
+    if df_ml is not None:
+        tasks += [(plot, df_ml) for plot in ml_smells.PLOTS]
+
+    if tasks:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # list() surfaces the first exception raised in a worker
+            list(pool.map(_render, tasks))
+
+    print(f"\n Success! All reports have been generated in: {os.path.abspath(REPORTS_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
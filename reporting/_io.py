@@ -0,0 +1,131 @@
+"""
+Shared loading for the reporting scripts.
+
+A cleaned DataFrame is written once to Parquet next to its source CSV
+(<csv dir>/.cache/<name>.parquet) and read back by later runs for as long
+as neither the CSV nor this module (the cleaning rules) has been modified
+since, skipping the CSV parse, the path normalization and the dedup.
+load_final() and load_ml() additionally keep the frame for the life of the
+process, so scripts run together (python -m reporting) share one load.
+Callers must not modify the returned frames.
+"""
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config.paths import DATA_DIR, PROCESSED_DATA_DIR
+
+FINAL_RESULTS_FILE = PROCESSED_DATA_DIR / "final_results.csv"
+ML_PREDICTIONS_FILE = PROCESSED_DATA_DIR / "ml_smell_predictions.csv"
+REPORTS_DIR = DATA_DIR / "reports"
+
+# Only the columns the plots read; the rest are never parsed. Any of them
+# missing from the CSV is skipped (see load_and_clean)
+FINAL_RESULTS_COLUMNS = ['repo_name', 'file_path', 'method_name', 'smell_label',
+                         'coverage_percent', 'risk_category']
+# As ml/inference.py writes them (mixed case)
+ML_PREDICTIONS_COLUMNS = ['File_Path', 'Method_Name', 'CC', 'lloc', 'difficulty',
+                          'effort', 'bugs', 'smell_label', 'ml_confidence']
+
+
+def _cache_path(file_path):
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, ".cache", os.path.splitext(name)[0] + ".parquet")
+
+
+def _categorical(column, normalize, sort=True):
+    # Low-cardinality labels: normalize each distinct value once, not every
+    # row, and keep integer codes for the groupbys and filters downstream.
+    # Missing values stay missing, as astype(str) leaves them in pandas 3.
+    # Categories are sorted, so groupbys order as they did on strings, or
+    # with sort=False kept in order of first appearance, which is what
+    # seaborn picks when no order/hue_order is given
+    column = column.astype(str).astype('category')
+    column = column.map(normalize, na_action='ignore').astype('category')
+    categories = pd.unique(column.dropna()).tolist()
+    return column.cat.reorder_categories(sorted(categories) if sort else categories)
+
+
+def clean(df):
+    """
+    Standardizes headers, simplifies absolute paths, ensures repository
+    consistency, and removes duplicates.
+    """
+    # A. Standardize columns and values
+    df.columns = df.columns.str.lower()
+    df['method_name'] = df['method_name'].astype(str).str.strip().str.lower()
+    # Simplify paths (removes system-specific prefixes); a path without
+    # 'target-repos/' comes back from rsplit unchanged
+    df['file_path'] = (
+        df['file_path'].astype(str)
+        .str.replace('\\', '/', regex=False)
+        .str.lower()
+        .str.strip()
+        .str.rsplit('target-repos/', n=1)
+        .str[-1]
+    )
+
+    # Standardize labels to UPPERCASE for consistency
+    if 'smell_label' in df.columns:
+        df['smell_label'] = _categorical(df['smell_label'], lambda s: s.upper().strip(), sort=False)
+
+    if 'risk_category' in df.columns:
+        df['risk_category'] = df['risk_category'].astype('category')
+
+    if 'repo_name' in df.columns:
+        df['repo_name'] = _categorical(df['repo_name'], lambda s: s.lower().strip())
+        # Prepend repo name to path if missing to ensure uniqueness. One
+        # anchored alternation and one element-wise join, both Arrow C++
+        # kernels over the whole column, with no Python string per row
+        repos = df['repo_name'].cat.categories
+        prefix = '^(?:' + '|'.join(re.escape(r) for r in repos) + ')/'
+        paths = pa.array(df['file_path'], type=pa.string())
+        repo_names = pa.array(df['repo_name']).cast(pa.string())
+        prefixed = pc.binary_join_element_wise(repo_names, paths, '/')
+        df['file_path'] = pc.if_else(
+            pc.match_substring_regex(paths, prefix), paths, prefixed
+        ).to_numpy(zero_copy_only=False)
+
+    # B. Remove duplicates to ensure unique method counts
+    return df.drop_duplicates(subset=['method_name', 'file_path'], keep='first')
+
+
+def load_and_clean(file_path, usecols):
+    """
+    Returns the cleaned contents of file_path, from the Parquet cache when
+    it is at least as new as the CSV and this module, or None if the CSV
+    does not exist.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: {file_path} not found.")
+        return None
+
+    cache_path = _cache_path(file_path)
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= max(os.path.getmtime(file_path),
+                                                    os.path.getmtime(__file__))):
+        return pd.read_parquet(cache_path, engine='pyarrow')
+
+    # Columns absent from this CSV are left out rather than failing the
+    # read; the plots check for the optional ones themselves
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [c for c in usecols if c in header]
+    df = clean(pd.read_csv(file_path, engine='pyarrow', usecols=usecols))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    df.to_parquet(cache_path, engine='pyarrow', compression='snappy')
+    return df
+
+
+@lru_cache(maxsize=1)
+def load_final():
+    return load_and_clean(FINAL_RESULTS_FILE, FINAL_RESULTS_COLUMNS)
+
+
+@lru_cache(maxsize=1)
+def load_ml():
+    return load_and_clean(ML_PREDICTIONS_FILE, ML_PREDICTIONS_COLUMNS)
@@ -0,0 +1,15 @@
+"""
+Plotting setup shared by the reporting scripts, applied once per process
+on first import. It must be imported before matplotlib.pyplot.
+
+The reports are only ever written to PNG, so the non-interactive Agg
+backend is selected up front and no GUI backend is initialized.
+"""
+import matplotlib
+
+matplotlib.use("Agg")
+
+import seaborn as sns  # noqa: E402
+
+# Set global aesthetic style
+sns.set_theme(style="whitegrid")
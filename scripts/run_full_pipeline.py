@@ -1,6 +1,6 @@
-import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # -------------------------------------------------
@@ -18,34 +18,71 @@ if str(PROJECT_ROOT) not in sys.path:
 from config.paths import (
     TARGET_REPOS_DIR,
     PROCESSED_DATA_DIR,
+    VALIDATION_REPOS,
 )
 
+from analysis import coverage, post_ml_aggregate
+from ml import build_training_dataset, build_validation_dataset, inference, train_model
+
 # -------------------------------------------------
-# Subprocess runner
+# In-process step runner
 # -------------------------------------------------
-def run_step(module_path: str, args=None):
+# Every stage is imported once and called directly, instead of starting a
+# fresh interpreter (and re-importing pandas, sklearn, radon) per stage.
+STEPS = {
+    "ml.build_training_dataset": build_training_dataset.build_dataset,
+    "ml.build_validation_dataset": build_validation_dataset.build_dataset,
+    "ml.train_model": train_model.main,
+    "ml.inference": inference.main,
+    "analysis.post_ml_aggregate": post_ml_aggregate.main,
+}
+
+
+def run_step(module_path: str):
     """
-    Run a Python module in a clean subprocess.
-    Used for both ML and analysis stages.
+    Run one pipeline stage in this process.
+    Used for both ML and analysis stages; any failure aborts the pipeline.
     """
     print(f"\n--- [Executing: {module_path}] ---")
+    try:
+        STEPS[module_path]()
+    except Exception as e:
+        print(f"❌ Error in {module_path}: {e}. Pipeline aborted.")
+        sys.exit(1)
 
-    cmd = [sys.executable, "-m", module_path]
-    if args:
-        cmd.extend(args)
 
-    env = os.environ.copy()
-    env["PYTHONPATH"] = str(PROJECT_ROOT)
+def run_coverage_parallel(repo_names):
+    """
+    Run the coverage stage for several repositories concurrently.
 
-    try:
-        subprocess.run(
-            cmd,
-            cwd=str(PROJECT_ROOT),
-            env=env,
-            check=True,
-        )
-    except subprocess.CalledProcessError:
-        print(f"❌ Error in {module_path}. Pipeline aborted.")
+    Each repo's coverage run is independent (own cwd, venv and output
+    file) and spends its time waiting on a pytest subprocess, so a thread
+    pool is sufficient. Each pytest run is itself spread over xdist
+    workers; the cores are split between the concurrent repos so the
+    total stays at one worker per core.
+    """
+    if not repo_names:
+        return
+
+    cpus = os.cpu_count() or 1
+    max_workers = min(len(repo_names), cpus)
+    xdist_workers = max(1, cpus // max_workers)
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(coverage.run, name, workers=xdist_workers): name
+            for name in repo_names
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[ERROR] {futures[future]}: {e}")
+                failed.append(futures[future])
+
+    if failed:
+        print(f"❌ Error in analysis.coverage for: {sorted(failed)}. Pipeline aborted.")
         sys.exit(1)
 
 
@@ -56,7 +93,7 @@ def main():
     print("🚀 STARTING MACHINE LEARNING–GUIDED CODE SMELL DETECTION PIPELINE")
 
     # -------------------------------------------------
-    # OFFLINE ML PHASE (isolated subprocesses)
+    # OFFLINE ML PHASE
     # -------------------------------------------------
     run_step("ml.build_training_dataset")
     run_step("ml.build_validation_dataset")
@@ -69,14 +106,16 @@ def main():
     print("\n📊 Starting post-ML analysis pipeline...")
 
     # ---- Coverage stage (no assumptions about existing JSONs) ----
-    print("\n🔍 Running coverage for all target repositories...")
-
-    for repo_dir in TARGET_REPOS_DIR.iterdir():
-        if repo_dir.is_dir():
-            run_step(
-                "analysis.coverage",
-                args=[repo_dir.name],
-            )
+    # Only validation repos are covered; coverage.run would just print
+    # [SKIP] for training repos.
+    print("\n🔍 Running coverage for validation repositories...")
+
+    run_coverage_parallel(
+        sorted(
+            p.name for p in TARGET_REPOS_DIR.iterdir()
+            if p.is_dir() and p.name in VALIDATION_REPOS
+        )
+    )
 
     # ---- Post-ML aggregation stage ----
     print("\n🧠 Aggregating ML predictions with coverage & risk analysis...")
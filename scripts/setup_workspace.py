@@ -101,7 +101,8 @@ def setup_repo(name, url, ref, category):
 
         run([
             str(python), "-m", "pip", "install",
-            "coverage", "pytest", "hypothesis", "freezegun"
+            # coverage>=7.10 for `patch = subprocess` (xdist workers)
+            "coverage>=7.10", "pytest", "pytest-xdist", "hypothesis", "freezegun"
         ])
     else:
         # Training repos: NO editable install, NO tests